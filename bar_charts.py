@@ -5,6 +5,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+from board_artefact import load_board
+
 OUTPUT_DIR = "./figures/bar_charts"
 
 selections1 = pd.read_csv("./figures/iteration_1/full_selections.csv").assign(
@@ -17,13 +19,13 @@ selections3 = pd.read_csv("./figures/iteration_3/full_selections.csv").assign(
     iteration="iteration_3"
 )
 
-board1 = pd.read_csv("./figures/iteration_1/formatted_board.csv").assign(
+board1 = load_board("./figures/iteration_1").to_pandas().assign(
     iteration="iteration_1"
 )
-board2 = pd.read_csv("./figures/iteration_2/formatted_board.csv").assign(
+board2 = load_board("./figures/iteration_2").to_pandas().assign(
     iteration="iteration_2"
 )
-board3 = pd.read_csv("./figures/iteration_3/formatted_board.csv").assign(
+board3 = load_board("./figures/iteration_3").to_pandas().assign(
     iteration="iteration_3"
 )
 
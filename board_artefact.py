@@ -0,0 +1,110 @@
+import os
+
+import polars as pl
+
+from constants import KEY_MAP, LABEL_MAX_LENGTH, LABEL_WRAP
+
+BOARD_ARTEFACT = "board.arrow"
+FORMATTED_BOARD_CSV = "formatted_board.csv"
+BOARD_ARTEFACT_COLS = [
+    "row_idx",
+    "parent_idx",
+    "depth",
+    "grid_row",
+    "grid_col",
+    "display_label",
+]
+
+
+def compile_board(formatted_board: pl.DataFrame) -> pl.DataFrame:
+    """
+    Adds the hierarchy index and label layout to a formatted board.
+    Rows are sorted by (menu_pattern, button) so the buttons of a menu are contiguous.
+    :param formatted_board: output of format_boards/format_board_v1
+    :return the formatted board with the additional columns
+    row_idx - position of the row in the artefact
+    parent_idx - row_idx of the menu row this button sits in, null for the main menu and orphans
+    depth - number of presses to reach the button
+    grid_row, grid_col - position of the button in the heatmap grid, null beyond 'R'
+    display_label - selection as shown by make_labels with LABEL_MAX_LENGTH and LABEL_WRAP
+    """
+    # Imported here so that loading the artefact does not pull in matplotlib
+    from heatmaps import format_phrase
+
+    board = formatted_board.with_columns(
+        pl.col("menu_pattern").fill_null(pl.lit("")),
+    ).sort(
+        "menu_pattern", "button", maintain_order=True
+    ).with_row_index(
+        "row_idx"
+    )
+    parents = board.select(
+        pl.col("full_pattern"), pl.col("row_idx").alias("parent_idx")
+    ).unique(
+        "full_pattern", keep="first"
+    )
+    grid_rows = {b: ij[0] for b, ij in KEY_MAP.items()}
+    grid_cols = {b: ij[1] for b, ij in KEY_MAP.items()}
+    return board.join(
+        parents, how="left", left_on="menu_pattern", right_on="full_pattern"
+    ).with_columns(
+        pl.col("full_pattern").str.len_chars().alias("depth"),
+        pl.col("button").replace_strict(grid_rows, default=None, return_dtype=pl.Int8).alias("grid_row"),
+        pl.col("button").replace_strict(grid_cols, default=None, return_dtype=pl.Int8).alias("grid_col"),
+        pl.col("selection").map_elements(
+            lambda phrase: format_phrase(phrase, max_length=LABEL_MAX_LENGTH, wrap=LABEL_WRAP),
+            return_dtype=pl.String,
+        ).alias("display_label"),
+    ).sort(
+        "row_idx"
+    )
+
+
+def write_board_artefact(formatted_board: pl.DataFrame, output_path: str) -> pl.DataFrame:
+    """
+    Compiles the board and writes it as an uncompressed Arrow IPC file, which polars memory-maps
+    when load_board and scan_board open it, so consumers skip parsing.
+    :param output_path: directory to write board.arrow into
+    :return the compiled board
+    """
+    compiled = compile_board(formatted_board)
+    compiled.write_ipc(os.path.join(output_path, BOARD_ARTEFACT), compression="uncompressed")
+    return compiled
+
+
+def _resolve(path: str) -> str:
+    if os.path.isdir(path):
+        artefact = os.path.join(path, BOARD_ARTEFACT)
+        return artefact if os.path.exists(artefact) else os.path.join(path, FORMATTED_BOARD_CSV)
+    return path
+
+
+def load_board(path: str) -> pl.DataFrame:
+    """
+    Opens a board for the downstream scripts.
+    :param path: a board.arrow file, a formatted_board.csv file or an iteration directory.
+    For a directory the artefact is preferred and formatted_board.csv is the fallback.
+    :return compiled board when reading the artefact, otherwise the formatted board
+    """
+    path = _resolve(path)
+    if path.endswith(".arrow"):
+        return pl.read_ipc(path)
+    return pl.read_csv(path)
+
+
+def scan_board(path: str) -> pl.LazyFrame:
+    """
+    Lazy version of load_board
+    """
+    path = _resolve(path)
+    if path.endswith(".arrow"):
+        return pl.scan_ipc(path)
+    return pl.scan_csv(path)
+
+
+if __name__ == "__main__":
+    # Compile the artefact from the formatted boards that are already on disk
+    for iteration in ["iteration_1", "iteration_2", "iteration_3"]:
+        output_path = os.path.join("./figures", iteration)
+        board = pl.read_csv(os.path.join(output_path, FORMATTED_BOARD_CSV))
+        write_board_artefact(board, output_path)
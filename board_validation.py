@@ -0,0 +1,116 @@
+import polars as pl
+
+from constants import BOARD_ROWS, BOARD_COLS, KEY_MAP, BOARD_VALIDATION_COLS
+
+DUPLICATE_PATTERN = "DUPLICATE_PATTERN"
+DUPLICATE_LINE_NUMBER = "DUPLICATE_LINE_NUMBER"
+ORPHAN = "ORPHAN"
+OUT_OF_RANGE_BUTTON = "OUT_OF_RANGE_BUTTON"
+OVERFULL_MENU = "OVERFULL_MENU"
+EMPTY_SLOT = "EMPTY_SLOT"
+
+
+def _issues(df: pl.LazyFrame, check: str, detail: pl.Expr) -> pl.LazyFrame:
+    return df.select(
+        pl.lit(check).alias("check"),
+        pl.col("Line Number").cast(pl.Int64),
+        pl.col("full_pattern").cast(pl.String),
+        pl.col("menu_pattern").cast(pl.String),
+        pl.col("button").cast(pl.String),
+        pl.col("selection").cast(pl.String),
+        pl.col("menu_title").cast(pl.String),
+        detail.cast(pl.String).alias("detail"),
+    )
+
+
+def validate_board(board: pl.DataFrame) -> pl.DataFrame:
+    """
+    Consistency checks of a formatted board. Every check is a hash group by or join, so the
+    cost is linear in the board size and all checks are collected together.
+    1. DUPLICATE_PATTERN - full_pattern appears on more than one row
+    2. DUPLICATE_LINE_NUMBER - Line Number appears on more than one row
+    3. ORPHAN - menu_pattern is not the full_pattern of any row, i.e. menu_title UNKNOWN
+    4. OUT_OF_RANGE_BUTTON - button is not one of A to R
+    5. OVERFULL_MENU - menu has more than BOARD_ROWS * BOARD_COLS buttons, one issue per menu
+    6. EMPTY_SLOT - row without a selection
+    :param board: output of format_boards/format_board_v1
+    :return one row per issue with BOARD_VALIDATION_COLS, empty if the board is consistent
+    """
+    lf = board.lazy()
+    if "Line Number" not in board.columns:
+        # Boards of iteration 1 have no line numbers
+        lf = lf.with_columns(pl.lit(None, dtype=pl.Int64).alias("Line Number"))
+    lf = lf.with_columns(pl.col("menu_pattern").fill_null(pl.lit("")))
+
+    duplicated_patterns = _issues(
+        lf.filter(pl.len().over("full_pattern") > 1),
+        DUPLICATE_PATTERN,
+        pl.format("{} rows", pl.len().over("full_pattern")),
+    )
+    duplicated_lines = _issues(
+        lf.filter(pl.col("Line Number").is_not_null() & (pl.len().over("Line Number") > 1)),
+        DUPLICATE_LINE_NUMBER,
+        pl.format("{} rows", pl.len().over("Line Number")),
+    )
+    orphans = _issues(
+        lf.filter(pl.col("menu_pattern") != "").join(
+            lf.select("full_pattern"), how="anti", left_on="menu_pattern", right_on="full_pattern"
+        ),
+        ORPHAN,
+        pl.format("no row with full_pattern {}", pl.col("menu_pattern")),
+    )
+    out_of_range = _issues(
+        lf.filter(~pl.col("button").is_in(list(KEY_MAP)) | pl.col("button").is_null()),
+        OUT_OF_RANGE_BUTTON,
+        pl.lit(f"button must be one of {min(KEY_MAP)}-{max(KEY_MAP)}"),
+    )
+    # One issue per menu, reported on the menu's own pattern
+    overfull = _issues(
+        lf.group_by("menu_pattern").agg(
+            pl.col("menu_title").first(),
+            pl.len().alias("n_buttons"),
+        ).filter(
+            pl.col("n_buttons") > BOARD_ROWS * BOARD_COLS
+        ).select(
+            pl.lit(None, dtype=pl.Int64).alias("Line Number"),
+            pl.col("menu_pattern").alias("full_pattern"),
+            pl.lit(None, dtype=pl.String).alias("menu_pattern"),
+            pl.lit(None, dtype=pl.String).alias("button"),
+            pl.col("menu_title").alias("selection"),
+            "menu_title",
+            "n_buttons",
+        ),
+        OVERFULL_MENU,
+        pl.format("{} buttons in menu", pl.col("n_buttons")),
+    )
+    empty = _issues(
+        lf.filter(pl.col("selection").is_null() | (pl.col("selection").str.strip_chars() == "")),
+        EMPTY_SLOT,
+        pl.lit("no selection"),
+    )
+    issues = pl.collect_all([duplicated_patterns, duplicated_lines, orphans, out_of_range, overfull, empty])
+    return pl.concat(issues, how="vertical").select(BOARD_VALIDATION_COLS)
+
+
+def summarize_validation(report: pl.DataFrame) -> pl.DataFrame:
+    """
+    Number of issues per check
+    """
+    return report.group_by("check").len().sort("check")
+
+
+def check_board(board: pl.DataFrame, strict: bool = False, ignore: tuple = (EMPTY_SLOT,)) -> pl.DataFrame:
+    """
+    Validates the board and prints a summary, for gating a pipeline run.
+    :param strict: raise a ValueError if there are issues other than those in ignore
+    :param ignore: checks that are reported but never fail the run, empty slots are expected on boards
+    :return the validation report
+    """
+    report = validate_board(board)
+    summary = summarize_validation(report)
+    for check, n in summary.iter_rows():
+        print(f"WARNING: board validation found {n} {check}")
+    failing = report.filter(~pl.col("check").is_in(list(ignore)))
+    if strict and len(failing):
+        raise ValueError(f"Board validation failed with {len(failing)} issues")
+    return report
@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from constants import BOARD_ROWS, BOARD_COLS, KEY_MAP
+
+DIRICHLET = "dirichlet"
+BOOTSTRAP = "bootstrap"
+BUTTON_INTERVAL_COLS = [
+    "menu_title",
+    "button",
+    "count",
+    "total",
+    "pct",
+    "pct_lower",
+    "pct_upper",
+]
+
+
+def _sample_batch(method: str, counts: np.ndarray, n_samples: int, prior: np.ndarray, seed) -> np.ndarray:
+    """
+    Draws n_samples replicates of every menu's button distribution at once.
+    :param counts: (n_menus, n_buttons)
+    :param prior: Dirichlet prior, same shape as counts
+    :return percentages of shape (n_samples, n_menus, n_buttons)
+    """
+    rng = np.random.default_rng(seed)
+    if method == DIRICHLET:
+        # Dirichlet draws as normalised gamma draws, which broadcast over menus unlike rng.dirichlet
+        draws = rng.standard_gamma(counts + prior, size=(n_samples,) + counts.shape)
+    elif method == BOOTSTRAP:
+        totals = counts.sum(axis=1)
+        p = np.divide(counts, totals[:, None], out=np.zeros_like(counts, dtype=float), where=totals[:, None] > 0)
+        draws = rng.multinomial(totals.astype(np.int64), p, size=(n_samples, len(counts))).astype(float)
+    else:
+        raise ValueError(f"Unknown interval method {method}, expected '{DIRICHLET}' or '{BOOTSTRAP}'")
+    sums = draws.sum(axis=2, keepdims=True)
+    return np.divide(draws * 100.0, sums, out=np.zeros_like(draws), where=sums > 0)
+
+
+def button_mask(board: pl.DataFrame, menus: List[str]) -> np.ndarray:
+    """
+    Which buttons of every menu hold a phrase, empty slots and missing buttons are False
+    :return boolean array of shape (len(menus), BOARD_ROWS, BOARD_COLS)
+    """
+    mask = np.zeros((len(menus), BOARD_ROWS, BOARD_COLS), dtype=bool)
+    menu_index = {m: k for k, m in enumerate(menus)}
+    for menu, button, phrase in board.select("menu_title", "button", "selection").iter_rows():
+        if menu in menu_index and button in KEY_MAP and phrase:
+            i, j = KEY_MAP[button]
+            mask[menu_index[menu], i, j] = True
+    return mask
+
+
+def button_intervals(counts: np.ndarray,
+                     mask: Optional[np.ndarray] = None,
+                     method: str = DIRICHLET,
+                     n_samples: int = 4000,
+                     level: float = 0.95,
+                     prior: Optional[float] = None,
+                     batch_size: int = 1000,
+                     n_workers: Optional[int] = None,
+                     seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Point estimate and interval for the share of presses of every button of every menu.
+    All menus are resampled together in batches of replicates, so the cost is a handful of
+    array operations rather than a Python loop per menu.
+    1. dirichlet - posterior of the button probabilities under a symmetric Dirichlet(prior) prior
+    2. bootstrap - percentile bootstrap, resampling each menu's presses from its observed distribution
+    The percentages are shares of the presses on the grid. The estimate is the median of the
+    same replicates, so it always lies within the interval: the posterior median for dirichlet
+    and the observed share for bootstrap.
+    :param counts: press counts of shape (n_menus, BOARD_ROWS, BOARD_COLS), e.g. make_heatmap_arrs
+    :param mask: buttons that exist, see button_mask. Only these get prior mass; all buttons when None
+    :param prior: pseudo-presses per button, None spreads a single pseudo-press over the
+    menu's buttons so the prior never outweighs the data of small menus
+    :param n_workers: split the batches over this many processes, None runs in this process
+    :return estimate, lower and upper percentages, each the same shape as counts
+    """
+    shape = counts.shape
+    flat = counts.reshape(shape[0], -1).astype(float)
+    if mask is None:
+        mask = np.ones(shape, dtype=bool)
+    # Pressed buttons always get prior mass, even if the board says the slot is empty
+    support = mask.reshape(shape[0], -1) | (flat > 0)
+    if prior is None:
+        n_buttons = support.sum(axis=1, keepdims=True)
+        flat_prior = np.divide(support, n_buttons, out=np.zeros_like(flat), where=n_buttons > 0)
+    else:
+        flat_prior = prior * support
+    seeds = np.random.SeedSequence(seed).spawn(-(-n_samples // batch_size))
+    sizes = [min(batch_size, n_samples - k * batch_size) for k in range(len(seeds))]
+    args = [(method, flat, size, flat_prior, s) for size, s in zip(sizes, seeds)]
+    if n_workers and n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            batches = list(pool.map(_sample_batch, *zip(*args)))
+    else:
+        batches = [_sample_batch(*a) for a in args]
+    samples = np.concatenate(batches, axis=0)
+    tail = (1.0 - level) / 2.0 * 100.0
+    estimate, lower, upper = np.percentile(samples, [50.0, tail, 100.0 - tail], axis=0)
+    return estimate.reshape(shape), lower.reshape(shape), upper.reshape(shape)
+
+
+def intervals_by_menu(menus: List[str],
+                      estimate: np.ndarray,
+                      lower: np.ndarray,
+                      upper: np.ndarray) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Splits the output of button_intervals into {menu_title: (estimate, lower, upper)} for make_labels
+    """
+    return {menu: (estimate[k], lower[k], upper[k]) for k, menu in enumerate(menus)}
+
+
+def intervals_frame(menus: List[str],
+                    counts: np.ndarray,
+                    estimate: np.ndarray,
+                    lower: np.ndarray,
+                    upper: np.ndarray) -> pl.DataFrame:
+    """
+    Long format table with one row per (menu, button) and columns BUTTON_INTERVAL_COLS.
+    pct is the estimate of button_intervals, count / total is the observed share
+    """
+    buttons = sorted(KEY_MAP, key=lambda b: KEY_MAP[b])
+    n_buttons = BOARD_ROWS * BOARD_COLS
+    flat = counts.reshape(len(menus), n_buttons)
+    totals = flat.sum(axis=1, keepdims=True)
+    return pl.DataFrame({
+        "menu_title": np.repeat(menus, n_buttons),
+        "button": np.tile(buttons, len(menus)),
+        "count": flat.ravel().astype(np.int64),
+        "total": np.repeat(totals.ravel(), n_buttons).astype(np.int64),
+        "pct": estimate.reshape(len(menus), n_buttons).ravel(),
+        "pct_lower": lower.reshape(len(menus), n_buttons).ravel(),
+        "pct_upper": upper.reshape(len(menus), n_buttons).ravel(),
+    }).select(BUTTON_INTERVAL_COLS)
@@ -20,6 +20,9 @@ KEY_MAP = dict(
 )
 BOARD_ROWS = 3
 BOARD_COLS = 6
+# Default label layout of the heatmaps, also precomputed into the board artefact
+LABEL_MAX_LENGTH = 15
+LABEL_WRAP = True
 
 FORMATTED_SELECTIONS_COL = [
     "Line Number",
@@ -29,6 +32,8 @@ FORMATTED_SELECTIONS_COL = [
     "word",
     "menu",
     "menu_ff",
+    "date",
+    "session",
 ]
 FORMATTED_BOARD_COLS = [
     "Line Number",
@@ -51,3 +56,30 @@ MATCHING_COLS = [
 FULL_SELECTIONS_COLS = (FORMATTED_SELECTIONS_COL
                         + [c for c in FORMATTED_BOARD_COLS if c not in FORMATTED_SELECTIONS_COL]
                         + MATCHING_COLS)
+MATCH_STATS_COLS = [
+    "Line Number",
+    "selection",
+    "source",
+    "match_type",
+    "n_candidates",
+    "n_best",
+    "is_ambiguous",
+]
+MATCH_SUMMARY_COLS = [
+    "match_type",
+    "n_selections",
+    "pct_selections",
+    "n_ambiguous",
+    "mean_candidates",
+    "max_candidates",
+]
+BOARD_VALIDATION_COLS = [
+    "check",
+    "Line Number",
+    "full_pattern",
+    "menu_pattern",
+    "button",
+    "selection",
+    "menu_title",
+    "detail",
+]
@@ -1,37 +1,26 @@
 #%%
 
-import polars as pl
+from word_diff import scan_boards, scan_selections, diff_boards, word_summary, unique_word_counts
 
-board1 = pl.read_csv("./figures/iteration_1/formatted_board.csv").with_columns(
-    pl.lit("iteration_1").alias("iteration")
-)
-board2 = pl.read_csv("./figures/iteration_2/formatted_board.csv").with_columns(
-    pl.lit("iteration_2").alias("iteration")
-)
-board3 = pl.read_csv("./figures/iteration_3/formatted_board.csv").with_columns(
-    pl.lit("iteration_3").alias("iteration")
-)
+ITERATIONS = ["iteration_1", "iteration_2", "iteration_3"]
+BOARD_FILES = [f"./figures/{it}" for it in ITERATIONS]
+SELECTION_FILES = [f"./figures/{it}/full_selections.csv" for it in ITERATIONS]
 
-cols = ["selection", "iteration", "is_menu"]
-all_boards = pl.concat([board1[cols], board2[cols], board3[cols]])
+boards = scan_boards(BOARD_FILES, labels=ITERATIONS)
+selections = scan_selections(SELECTION_FILES, labels=ITERATIONS)
 # %%
 
-summary = all_boards.group_by(
-    ["selection", "iteration", "is_menu"]
-).len().sort(["selection", "iteration", "is_menu"])
+summary = word_summary(boards).collect()
 summary
 summary.write_csv("word_summary.csv")
 
 # %%
 
-cts = (summary
-       .drop_nans()
-       .filter(pl.col("selection") != "")
-       .group_by(["selection", "iteration"])
-       .agg(pl.col("len").sum().alias("count"))
-       .group_by("iteration")
-       .agg(pl.col("count").sum().alias("total_count"),
-            pl.col("selection").count().alias("n_unique_words")
-            ))
+cts = unique_word_counts(boards).collect()
 cts.write_csv("unique_word_counts.csv")
 # %%
+
+changes = diff_boards(boards, selections, n_versions=len(ITERATIONS)).collect()
+changes.write_csv("word_changes.csv")
+changes.group_by("iteration", "change").len().sort("iteration", "change")
+# %%
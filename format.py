@@ -167,6 +167,30 @@ def format_selections(df: pl.DataFrame) -> pl.DataFrame:
     :param df: requires column "Word/Phrase" and "Menu"
     :return: dataframe with column "selection" and "row_number"
     """
+    if "Date/Video Link" in df.columns:
+        # Dates are often only filled in on the first row of a session, so the session and date
+        # are carried forward before any rows are dropped.
+        # The raw link is carried forward rather than the parsed date, so rows under a link that
+        # does not parse get a null date instead of the previous session's date.
+        # A session starts when the link changes to a different date. A video name followed by its
+        # written date (20231221_112731 then 12.21.23) is one session, and so are several
+        # recordings on the same day (6.3.20 A, 6.3.20 B).
+        warn_unparsed_session_links(df)
+        link = pl.col("Date/Video Link").forward_fill()
+        date = parse_session_date(link)
+        new_session = (
+            (pl.int_range(pl.len()) == 0)
+            | (link.ne_missing(link.shift(1)) & date.ne_missing(date.shift(1)))
+        )
+        df = df.with_columns(
+            new_session.cum_sum().alias("session"),
+            date.alias("date"),
+        )
+    else:
+        df = df.with_columns(
+            pl.lit(0, dtype=pl.UInt32).alias("session"),
+            pl.lit(None, dtype=pl.Date).alias("date"),
+        )
     if "EXCLUDE" in df.columns:
         init_length = len(df)
         df = df.filter(~(pl.col("EXCLUDE").fill_null(pl.lit(False))))
@@ -192,10 +216,50 @@ def format_selections(df: pl.DataFrame) -> pl.DataFrame:
              pl.col("Word/Phrase").alias("word"),
              pl.col("Menu").str.to_uppercase().alias("menu"),
              pl.col("Menu").forward_fill().str.to_uppercase().alias("menu_ff"),
+             "date",
+             pl.col("session").cast(pl.UInt32),
              )
     return result
 
 
+def parse_session_date(col: pl.Expr) -> pl.Expr:
+    """
+    Parses the "Date/Video Link" column, which is one of
+    1. "5.12.20" or "6.3.20 A" - month.day.year
+    2. "12/24/21" - month/day/year
+    3. "20231221_112731", "20231109-201118" or "20240130" - video file name, year month day
+    optionally followed by the time
+    Anything else is null
+    """
+    col = col.cast(pl.String).str.strip_chars()
+    video = col.str.extract(r"^(\d{8})(?:[_-]|$)", 1).str.strptime(pl.Date, "%Y%m%d", strict=False)
+    parts = col.str.extract_groups(r"^(\d{1,2})[./](\d{1,2})[./](\d{2,4})")
+    year = parts.struct.field("3").cast(pl.Int32, strict=False)
+    year = pl.when(year < 100).then(year + 2000).otherwise(year)
+    written = pl.date(
+        year,
+        parts.struct.field("1").cast(pl.Int32, strict=False),
+        parts.struct.field("2").cast(pl.Int32, strict=False),
+    )
+    return pl.coalesce(video, written)
+
+
+def warn_unparsed_session_links(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Prints the "Date/Video Link" values that parse_session_date cannot read. The rows of
+    those sessions have no date and are left out of date windows.
+    :return dataframe with column "Date/Video Link" and "len"
+    """
+    unparsed = df.select(
+        pl.col("Date/Video Link").cast(pl.String)
+    ).drop_nulls().filter(
+        parse_session_date(pl.col("Date/Video Link")).is_null()
+    ).group_by("Date/Video Link").len().sort("Date/Video Link")
+    for link, n in unparsed.iter_rows():
+        print(f"WARNING: could not parse a date from link {link!r} ({n} rows)")
+    return unparsed
+
+
 def combine(selections: pl.DataFrame, board: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame]:
     """
     Joins the selection to the board
@@ -203,6 +267,26 @@ def combine(selections: pl.DataFrame, board: pl.DataFrame) -> tuple[pl.DataFrame
     1. if there is a manual inputted pattern in "Location path code" - called CODE_MATCH
     2. if selection type (meaning is a MENU or FINAL) has a multiplicity of 1 - called UNIQUE_MATCH
     3. if selection type is final and last pressed menu by Ellie uniquely defines - called FORWARD_FILL
+    See combine_with_stats for the match-quality statistics of the same join.
+    """
+    result, unmatched, _, _ = combine_with_stats(selections, board)
+    return result, unmatched
+
+
+def combine_with_stats(selections: pl.DataFrame,
+                       board: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """
+    Same join as combine, additionally returning how each match was chosen.
+    The statistics are window aggregations over the candidate matches that are computed
+    while picking the top-ranked board row, so there is no second scan.
+    :return
+    result - as combine
+    unmatched - as combine
+    match_stats - one row per selection with MATCH_STATS_COLS
+        n_candidates - number of board rows matched by any rule
+        n_best - number of board rows matched at the best rank
+        is_ambiguous - more than one board row matched at the best rank, the pick is arbitrary
+    match_summary - one row per match_type with MATCH_SUMMARY_COLS
     """
     code_match = (
             pl.col("Location path code") == pl.col("full_pattern")
@@ -238,18 +322,25 @@ def combine(selections: pl.DataFrame, board: pl.DataFrame) -> tuple[pl.DataFrame
         (pl.when(code_match).then(pl.lit(1))
          .when(unique_match).then(pl.lit(2))
          .when(forward_fill).then(pl.lit(3))
-         .otherwise(pl.lit("NONE")).alias("match_rank"))
+         .otherwise(pl.lit(None)).alias("match_rank"))
     )
-    matches = df.filter(
+    candidates = df.filter(
         (pl.col("is_match"))
+    ).with_columns(
+        pl.len().over("Line Number").alias("n_candidates"),
+        (pl.col("match_rank") == pl.col("match_rank").min().over("Line Number")).alias("is_best"),
+    ).filter(
+        pl.col("is_best")
+    ).with_columns(
+        pl.len().over("Line Number").alias("n_best")
+    ).sort(
+        "Line Number", "full_pattern"
     ).group_by(
-        pl.col("Line Number")
-    ).map_groups(
-        lambda group: group.sort(pl.col("match_rank"), descending=False).head(1),
-        schema=None
-    ).select(
+        "Line Number", maintain_order=True
+    ).first().collect()
+    matches = candidates.select(
         constants.FULL_SELECTIONS_COLS
-    ).collect()
+    )
     unmatched = selections.join(
         matches.select("Line Number"), how="anti", on="Line Number"
     ).with_columns(
@@ -267,4 +358,38 @@ def combine(selections: pl.DataFrame, board: pl.DataFrame) -> tuple[pl.DataFrame
     )
     if (len(result) != len(selections)) or (not (result["Line Number"] == selections["Line Number"]).all()):
         print("WARNING: LINE NUMBERS DO NOT MATCH")
-    return result, unmatched
+
+    match_stats = selections.select(
+        "Line Number", "selection", "source"
+    ).join(
+        candidates.select("Line Number", "match_type", "n_candidates", "n_best"),
+        how="left",
+        on="Line Number"
+    ).with_columns(
+        pl.col("match_type").fill_null(pl.lit("NONE")),
+        pl.col("n_candidates").fill_null(0),
+        pl.col("n_best").fill_null(0),
+    ).with_columns(
+        (pl.col("n_best") > 1).alias("is_ambiguous")
+    ).select(
+        constants.MATCH_STATS_COLS
+    ).sort(
+        "Line Number"
+    )
+    match_summary = match_stats.group_by(
+        "match_type"
+    ).agg(
+        pl.len().alias("n_selections"),
+        (pl.len() / len(selections) * 100.0).alias("pct_selections"),
+        pl.col("is_ambiguous").sum().alias("n_ambiguous"),
+        pl.col("n_candidates").mean().alias("mean_candidates"),
+        pl.col("n_candidates").max().alias("max_candidates"),
+    ).select(
+        constants.MATCH_SUMMARY_COLS
+    ).sort(
+        "match_type"
+    )
+    n_ambiguous = match_stats["is_ambiguous"].sum()
+    if n_ambiguous:
+        print(f"WARNING: {n_ambiguous} selections matched several board rows at the same rank")
+    return result, unmatched, match_stats, match_summary
@@ -1,8 +1,13 @@
 import pandas as pd
 import argparse
 import os
+import sys
 from collections import defaultdict
 
+# The board loader lives in the repository root, one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from board_artefact import load_board
+
 # --- Configuration for Node Colors ---
 COLOR_ROOT = "pink"
 COLOR_MAIN_MENU_CHILD_IS_MENU = "orange"
@@ -36,7 +41,11 @@ DOT_HEADER_SIMPLE = """digraph "Speech Board Menu Tree" {
 def load_and_prepare_data(csv_filepath):
     """Loads CSV, cleans it, and prepares node and children maps."""
     try:
-        df = pd.read_csv(csv_filepath)
+        if csv_filepath.endswith(".arrow"):
+            # Compiled board artefact, opened like the other downstream scripts do
+            df = load_board(csv_filepath).to_pandas()
+        else:
+            df = pd.read_csv(csv_filepath)
     except FileNotFoundError:
         print(f"Error: The file '{csv_filepath}' was not found.")
         exit(1)
@@ -160,7 +169,7 @@ def generate_dot_string(node_data_map, children_map, main_menu_node_id, use_bus_
 # --- Main Script Execution ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a Graphviz .gv file from a speech board CSV.")
-    parser.add_argument("csv_input", help="Path to the input CSV file.")
+    parser.add_argument("csv_input", help="Path to the input formatted board CSV file or board.arrow artefact.")
     parser.add_argument("gv_output", help="Path for the output .gv (DOT language) file.")
     parser.add_argument("--simple-edges", action="store_true",
                         help="Use simple direct edges instead of bus-style with junction nodes.")
@@ -0,0 +1,193 @@
+from typing import List
+
+import numpy as np
+import polars as pl
+from matplotlib import animation
+from matplotlib import pyplot as plt
+
+from constants import BOARD_ROWS, BOARD_COLS, KEY_MAP
+from heatmaps import draw_annotated_heatmap
+
+SESSION_WINDOW = "session"
+BUTTON_INDEX = {b: i * BOARD_COLS + j for b, (i, j) in KEY_MAP.items()}
+
+
+def window_expr(every: str = "1w") -> pl.Expr:
+    """
+    Window a selection falls in.
+    :param every: "session" to use the session column, otherwise a polars duration such as
+    "1d", "1w" or "1mo" applied to the date column
+    """
+    if every == SESSION_WINDOW:
+        return pl.col("session")
+    return pl.col("date").dt.truncate(every)
+
+
+def make_windowed_heatmap_arrs(df: pl.DataFrame,
+                               menus: List[str],
+                               every: str = "1w") -> tuple[list, np.ndarray]:
+    """
+    Press counts of every (window, menu) pair, computed in one group by and scattered into
+    a single array rather than filtering per menu and window.
+    :param df: matched selections with columns menu_title, button, date and session
+    :param menus: menu titles, defines the order of the second axis
+    :param every: see window_expr
+    :return
+    windows - sorted window labels (session numbers or window start dates), the first axis
+    arr - counts of shape (len(windows), len(menus), BOARD_ROWS, BOARD_COLS)
+    """
+    counts = df.filter(
+        pl.col("menu_title").is_in(menus) & pl.col("button").is_in(list(KEY_MAP))
+    ).group_by(
+        window_expr(every).alias("window"), "menu_title", "button"
+    ).len().drop_nulls("window")
+    windows = counts["window"].unique().sort().to_list()
+    arr = np.zeros((len(windows), len(menus), BOARD_ROWS * BOARD_COLS), dtype=float)
+    _scatter(arr, counts, windows, menus)
+    return windows, arr.reshape(len(windows), len(menus), BOARD_ROWS, BOARD_COLS)
+
+
+def _scatter(arr: np.ndarray, counts: pl.DataFrame, windows: list, menus: List[str]) -> None:
+    window_index = {w: k for k, w in enumerate(windows)}
+    menu_index = {m: k for k, m in enumerate(menus)}
+    w = counts["window"].replace_strict(window_index, return_dtype=pl.Int64).to_numpy()
+    m = counts["menu_title"].replace_strict(menu_index, return_dtype=pl.Int64).to_numpy()
+    b = counts["button"].replace_strict(BUTTON_INDEX, return_dtype=pl.Int64).to_numpy()
+    np.add.at(arr, (w, m, b), counts["len"].to_numpy())
+
+
+def update_windowed_heatmap_arrs(windows: list,
+                                 arr: np.ndarray,
+                                 df: pl.DataFrame,
+                                 menus: List[str],
+                                 every: str = "1w") -> tuple[list, np.ndarray]:
+    """
+    Adds newly recorded selections to an existing windowed array without recounting the
+    old ones. Windows not seen before are added in order.
+    The window labels of the new batch must mean the same as the old ones, so only date
+    windows are supported: session numbers restart at 1 on every format_selections call and
+    would add the new sessions into the old ones.
+    :param windows, arr: output of make_windowed_heatmap_arrs over the same menus and every
+    :param df: only the new selections
+    :param every: a polars duration, see window_expr
+    """
+    if every == SESSION_WINDOW:
+        raise ValueError("Session numbers are not stable between batches, use a date window such as '1w'")
+    new_windows, new_arr = make_windowed_heatmap_arrs(df, menus, every=every)
+    all_windows = sorted(set(windows) | set(new_windows))
+    result = np.zeros((len(all_windows),) + arr.shape[1:], dtype=float)
+    index = {w: k for k, w in enumerate(all_windows)}
+    result[[index[w] for w in windows]] += arr
+    result[[index[w] for w in new_windows]] += new_arr
+    return all_windows, result
+
+
+def densify_windows(windows: list, arr: np.ndarray, every: str = "1w") -> tuple[list, np.ndarray]:
+    """
+    Adds the empty windows between the first and last one, so that the first axis steps
+    through time evenly. Sessions are returned as they are.
+    :param windows, arr: output of make_windowed_heatmap_arrs with the same every
+    """
+    if every == SESSION_WINDOW or not windows:
+        return windows, arr
+    dense = pl.date_range(windows[0], windows[-1], interval=every, eager=True).to_list()
+    index = {w: k for k, w in enumerate(dense)}
+    result = np.zeros((len(dense),) + arr.shape[1:], dtype=arr.dtype)
+    result[[index[w] for w in windows]] = arr
+    return dense, result
+
+
+def rolling_heatmap_arrs(windows: list,
+                         arr: np.ndarray,
+                         size: int,
+                         every: str = "1w") -> tuple[list, np.ndarray]:
+    """
+    Rolling sum over the last `size` windows, computed from a cumulative sum so each step
+    is a single subtraction instead of re-adding the whole window.
+    For date windows the empty windows are filled in first (see densify_windows), so a size
+    of 4 with every="1w" always covers four weeks. For sessions it covers `size` sessions.
+    :param windows, arr: output of make_windowed_heatmap_arrs with the same every
+    :return dense windows and the rolled counts, entry k covers windows k - size + 1 .. k
+    """
+    if size < 1:
+        raise ValueError(f"Rolling window size must be at least 1, got {size}")
+    windows, arr = densify_windows(windows, arr, every=every)
+    cumulative = np.cumsum(arr, axis=0)
+    rolled = cumulative.copy()
+    rolled[size:] -= cumulative[:-size]
+    return windows, rolled
+
+
+def normalize_heatmap_arrs(arr: np.ndarray) -> np.ndarray:
+    """
+    Percentages per grid, i.e. over the last two axes
+    """
+    totals = arr.sum(axis=(-2, -1), keepdims=True)
+    return np.divide(arr * 100.0, totals, out=np.zeros_like(arr, dtype=float), where=totals > 0)
+
+
+def window_label(window) -> str:
+    if isinstance(window, int):
+        return f"session {window}"
+    return str(window)
+
+
+def make_small_multiples(arr: np.ndarray,
+                         windows: list,
+                         menu: str,
+                         normalize: bool = False,
+                         n_cols: int = 4) -> tuple[plt.Figure, np.ndarray]:
+    """
+    One heatmap per window for a single menu, sharing a colour scale.
+    :param arr: one menu's grids of shape (len(windows), BOARD_ROWS, BOARD_COLS)
+    """
+    if normalize:
+        arr = normalize_heatmap_arrs(arr)
+    n_rows = max(1, -(-len(windows) // n_cols))
+    # Fixed margins in inches instead of a layout engine, which would lay out and draw the
+    # figure twice when saving it
+    height = 1.6 * n_rows
+    fig, axes = plt.subplots(n_rows, n_cols, figsize=(3 * n_cols, height), squeeze=False,
+                             gridspec_kw={"left": 0.01, "right": 0.99, "bottom": 0.05 / height,
+                                          "top": 1 - 0.55 / height, "wspace": 0.05, "hspace": 0.25})
+    vmax = arr.max() if arr.size and arr.max() > 0 else 1
+    fmt = ".0f" if normalize else "g"
+    for k, ax in enumerate(axes.flat):
+        if k >= len(windows):
+            ax.axis("off")
+            continue
+        labels = [[format(value, fmt) for value in row] for row in arr[k]]
+        draw_annotated_heatmap(ax, arr[k], labels, fontsize=6, vmin=0, vmax=vmax, cbar=False)
+        ax.set_title(window_label(windows[k]), fontsize=8)
+    fig.suptitle(menu, y=1 - 0.05 / height)
+    return fig, axes
+
+
+def make_heatmap_animation(arr: np.ndarray,
+                           windows: list,
+                           menu: str,
+                           normalize: bool = False,
+                           interval: int = 500) -> animation.FuncAnimation:
+    """
+    Animates one menu's heatmap through the windows. Save with e.g.
+    anim.save("menu.gif", writer=animation.PillowWriter(fps=2))
+    :param arr: one menu's grids of shape (len(windows), BOARD_ROWS, BOARD_COLS)
+    """
+    if normalize:
+        arr = normalize_heatmap_arrs(arr)
+    fig = plt.figure(figsize=(7, 3), layout='constrained')
+    ax = fig.add_subplot(111)
+    vmax = arr.max() if arr.size and arr.max() > 0 else 1
+    image = ax.imshow(arr[0] if len(windows) else np.zeros((BOARD_ROWS, BOARD_COLS)),
+                      vmin=0, vmax=vmax, cmap="rocket")
+    ax.set_xticks([])
+    ax.set_yticks([])
+    fig.colorbar(image, ax=ax, aspect=10)
+
+    def draw(k):
+        image.set_data(arr[k])
+        ax.set_title(f"{menu} - {window_label(windows[k])}")
+        return [image]
+
+    return animation.FuncAnimation(fig, draw, frames=len(windows), interval=interval, blit=False)
+
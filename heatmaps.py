@@ -1,11 +1,16 @@
-from typing import List
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import polars as pl
 import seaborn as sns
 from matplotlib import pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from seaborn.utils import relative_luminance
 
-from constants import BOARD_ROWS, BOARD_COLS, KEY_MAP
+from constants import BOARD_ROWS, BOARD_COLS, KEY_MAP, LABEL_MAX_LENGTH, LABEL_WRAP
 
 
 def make_heatmap_arr(df, normalize: bool = True) -> np.ndarray:
@@ -23,44 +28,64 @@ def make_heatmap_arr(df, normalize: bool = True) -> np.ndarray:
     return arr
 
 
-def make_labels(arr, menu: str, board: pl.DataFrame, normalized: bool = False, max_length: int = 15,
-                wrap: bool = True) -> List[List[str]]:
+def format_phrase(phrase: str, max_length: int = LABEL_MAX_LENGTH, wrap: bool = LABEL_WRAP) -> str:
+    """
+    Shortens a button phrase for display, either wrapping it onto two lines or truncating it
+    """
+    # Truncate long phrases
+    if not phrase:
+        phrase = ""
+    if len(phrase) > max_length:
+        if wrap and " " in phrase:
+            # Simple word wrapping by splitting at space closest to middle
+            mid = len(phrase) // 2
+            left_space = phrase.rfind(" ", 0, mid)
+            right_space = phrase.find(" ", mid)
+
+            if left_space != -1 and (right_space == -1 or mid - left_space <= right_space - mid):
+                split_pos = left_space
+            elif right_space != -1:
+                split_pos = right_space
+            else:
+                # No spaces, just truncate
+                display_phrase = phrase[:max_length - 3] + "..."
+
+            if left_space != -1 or right_space != -1:
+                display_phrase = phrase[:split_pos] + "\n" + phrase[split_pos + 1:]
+        else:
+            display_phrase = phrase[:max_length - 3] + "..."
+    else:
+        display_phrase = phrase
+    return display_phrase
+
+
+def make_labels(arr, menu: str, board: pl.DataFrame, normalized: bool = False, max_length: int = LABEL_MAX_LENGTH,
+                wrap: bool = LABEL_WRAP, intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> List[List[str]]:
+    """
+    :param intervals: optional (estimate, lower, upper) percentage arrays from button_stats,
+    shown instead of arr when normalized so that the percentage lies within its interval
+    """
     board = board.filter(pl.col("menu_title") == menu)
-    phrase_indices = [(r[1], KEY_MAP.get(r[0], ("", ""))) for r in board.select("button", "selection").iter_rows()]
+    # A compiled board (see board_artefact) already holds the default display labels
+    precomputed = ("display_label" in board.columns
+                   and max_length == LABEL_MAX_LENGTH
+                   and wrap == LABEL_WRAP)
+    phrase_col = "display_label" if precomputed else "selection"
+    phrase_indices = [(r[1], KEY_MAP.get(r[0], ("", ""))) for r in board.select("button", phrase_col).iter_rows()]
     labels = [["" for _ in range(BOARD_COLS)] for _ in range(BOARD_ROWS)]
     for phrase, (i, j) in phrase_indices:
         if i == "" or j == "":
             print(f"Issue with menu {menu}")
             print(f"Error with phrase: {phrase}. Likely cause that the button is above 'R'")
             continue
-        # Truncate long phrases
-        if not phrase:
-            phrase = ""
-        if len(phrase) > max_length:
-            if wrap and " " in phrase:
-                # Simple word wrapping by splitting at space closest to middle
-                mid = len(phrase) // 2
-                left_space = phrase.rfind(" ", 0, mid)
-                right_space = phrase.find(" ", mid)
-
-                if left_space != -1 and (right_space == -1 or mid - left_space <= right_space - mid):
-                    split_pos = left_space
-                elif right_space != -1:
-                    split_pos = right_space
-                else:
-                    # No spaces, just truncate
-                    display_phrase = phrase[:max_length - 3] + "..."
-
-                if left_space != -1 or right_space != -1:
-                    display_phrase = phrase[:split_pos] + "\n" + phrase[split_pos + 1:]
-            else:
-                display_phrase = phrase[:max_length - 3] + "..."
-        else:
-            display_phrase = phrase
+        display_phrase = (phrase or "") if precomputed else format_phrase(phrase, max_length=max_length, wrap=wrap)
 
         if display_phrase == "":
             # This is the case when the board has and empty slot
             labels[i][j] = ""
+        elif normalized and intervals is not None:
+            estimate, lower, upper = intervals
+            labels[i][j] = f"{display_phrase}\n{estimate[i, j]:.1f}% [{lower[i, j]:.0f}-{upper[i, j]:.0f}]"
         elif normalized:
             labels[i][j] = f"{display_phrase}\n{arr[i, j]:.1f}%"
         else:
@@ -68,24 +93,197 @@ def make_labels(arr, menu: str, board: pl.DataFrame, normalized: bool = False, m
     return labels
 
 
+def draw_annotated_heatmap(ax: plt.Axes,
+                           arr: np.ndarray,
+                           labels: List[List[str]],
+                           fontsize: int = 10,
+                           vmin: Optional[float] = None,
+                           vmax: Optional[float] = None,
+                           cbar: bool = True):
+    """
+    Draws arr with a label in every cell, like sns.heatmap(annot=labels) without tick labels.
+    sns.heatmap draws the whole figure on every call to check its tick labels for overlap,
+    so a figure with many heatmaps took time quadratic in the number of axes.
+    :return the mesh that was drawn
+    """
+    sns.despine(ax=ax, left=True, bottom=True)
+    mesh = ax.pcolormesh(arr, cmap="rocket", vmin=vmin, vmax=vmax)
+    ax.set(xlim=(0, arr.shape[1]), ylim=(0, arr.shape[0]), xticks=[], yticks=[])
+    ax.invert_yaxis()
+    if cbar:
+        # Use the number of rows as the base for the colorbar aspect ratio
+        # This will make the colorbar height match the heatmap height
+        colorbar = ax.figure.colorbar(mesh, ax=ax, aspect=10)
+        colorbar.outline.set_linewidth(0)
+    mesh.update_scalarmappable()
+    colors = mesh.get_facecolors()
+    for k, (i, j) in enumerate(np.ndindex(arr.shape)):
+        # Same contrast rule as seaborn, dark text on light cells
+        color = ".15" if relative_luminance(colors[k]) > .408 else "w"
+        ax.text(j + .5, i + .5, labels[i][j], color=color, ha="center", va="center", fontsize=fontsize)
+    return mesh
+
+
+def draw_heatmap_by_menu(ax: plt.Axes,
+                         df: pl.DataFrame,
+                         menu: str,
+                         board: pl.DataFrame,
+                         normalize: bool = False,
+                         max_length: int = LABEL_MAX_LENGTH,
+                         wrap: bool = LABEL_WRAP,
+                         fontsize: int = 10,
+                         intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> np.ndarray:
+    """
+    Draws the heatmap of a single menu onto an existing axis.
+    :param df: matched selections, already filtered to the menu
+    :param intervals: see make_labels
+    :return the heatmap array that was drawn
+    """
+    if normalize and intervals is not None:
+        # Colour by the observed share of the presses on the grid, the denominator of the
+        # intervals. The labels show the estimate, which differs for small menus
+        counts = make_heatmap_arr(df, normalize=False)
+        arr = counts * 100.0 / counts.sum() if counts.sum() > 0 else counts
+    else:
+        arr = make_heatmap_arr(df, normalize=normalize)
+
+    # Format the annotations as percentages
+    # Create a version of the array with formatted strings
+    labels = make_labels(arr, menu, board, normalize, max_length=max_length, wrap=wrap, intervals=intervals)
+
+    draw_annotated_heatmap(ax, arr, labels, fontsize=fontsize)
+    ax.set_title(menu)
+    return arr
+
+
 def make_heatmap_plot_by_menu(df: pl.DataFrame,
                               menu: str,
                               board: pl.DataFrame,
                               normalize: bool = False,
-                              max_length: int = 15,
-                              wrap: bool = True) -> tuple[plt.Figure, plt.Axes]:
+                              max_length: int = LABEL_MAX_LENGTH,
+                              wrap: bool = LABEL_WRAP,
+                              intervals: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> tuple[plt.Figure, plt.Axes]:
     plot_df = df.filter(pl.col("menu_title") == menu)
     fig = plt.figure(figsize=(10, 5), layout='constrained')  # Increased figure size
     ax = fig.add_subplot(111)
-    arr = make_heatmap_arr(plot_df, normalize=normalize)
+    draw_heatmap_by_menu(ax, plot_df, menu, board, normalize=normalize, max_length=max_length, wrap=wrap,
+                         intervals=intervals)
+    return fig, ax
 
-    # Format the annotations as percentages
-    # Create a version of the array with formatted strings
-    labels = make_labels(arr, menu, board, normalize, max_length=max_length, wrap=wrap)
 
-    # Use the number of rows (2) as the base for the colorbar aspect ratio
-    # This will make the colorbar height match the heatmap height
-    sns.heatmap(arr, ax=ax, xticklabels=False, yticklabels=False, cbar_kws={'aspect': 10},
-                annot=labels, fmt="", annot_kws={"fontsize": 10})  # Added smaller font size
-    ax.set_title(menu)
-    return fig, ax
+def safe_filename(name: str) -> str:
+    """
+    Makes a menu title usable as a file name, e.g. "SELF/STATE" -> "SELF_STATE"
+    """
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', "_", str(name)).strip(" .")
+    return name or "_"
+
+
+def write_heatmap_atlas(df: pl.DataFrame,
+                        board: pl.DataFrame,
+                        output_path: str,
+                        menus: Optional[List[str]] = None,
+                        file_format: str = "pdf",
+                        tiles_per_page: int = 6,
+                        max_length: int = LABEL_MAX_LENGTH,
+                        wrap: bool = LABEL_WRAP,
+                        intervals: Optional[Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None) -> dict:
+    """
+    Renders the count and percentage heatmaps of every menu into an atlas instead of
+    two PNG files per menu.
+    1. pdf - one multi-page heatmaps_cts.pdf and heatmaps_pct.pdf
+    2. png - one tiled image per page, heatmaps_cts_<page>.png and heatmaps_pct_<page>.png
+    Writes atlas_index.json which maps each menu_title to its file, page and tile.
+    :param df: matched selections
+    :param intervals: optional {menu_title: (estimate, lower, upper)} shown on the percentage heatmaps
+    :return the index that was written
+    """
+    if file_format not in ("pdf", "png"):
+        raise ValueError(f"Unsupported atlas format {file_format}, expected 'pdf' or 'png'")
+    if menus is None:
+        menus = board["menu_title"].unique().sort().to_list()
+    # Split once instead of filtering the full frames for every menu
+    selections_by_menu = df.partition_by("menu_title", as_dict=True)
+    board_by_menu = board.partition_by("menu_title", as_dict=True)
+    empty_selections = df.clear()
+    empty_board = board.clear()
+    pages = [menus[i:i + tiles_per_page] for i in range(0, len(menus), tiles_per_page)]
+
+    index = {"format": file_format, "tiles_per_page": tiles_per_page, "menus": {}}
+    for kind, normalize in (("cts", False), ("pct", True)):
+        pdf = PdfPages(os.path.join(output_path, f"heatmaps_{kind}.pdf")) if file_format == "pdf" else None
+        for page, page_menus in enumerate(pages):
+            # Fixed margins in inches instead of a layout engine, which would lay out and draw
+            # every page twice when saving it
+            height = 4 * len(page_menus)
+            fig, axes = plt.subplots(len(page_menus), 1, figsize=(10, height), squeeze=False,
+                                     gridspec_kw={"left": 0.01, "right": 0.99, "bottom": 0.1 / height,
+                                                  "top": 1 - 0.35 / height, "hspace": 0.12})
+            for tile, (menu, ax) in enumerate(zip(page_menus, axes[:, 0])):
+                draw_heatmap_by_menu(ax,
+                                     selections_by_menu.get((menu,), empty_selections),
+                                     menu,
+                                     board_by_menu.get((menu,), empty_board),
+                                     normalize=normalize,
+                                     max_length=max_length,
+                                     wrap=wrap,
+                                     intervals=intervals.get(menu) if (normalize and intervals) else None)
+                if pdf is not None:
+                    file_name = f"heatmaps_{kind}.pdf"
+                else:
+                    file_name = f"heatmaps_{kind}_{page:03d}.png"
+                index["menus"].setdefault(menu, {})[kind] = {"file": file_name, "page": page, "tile": tile}
+            if pdf is not None:
+                pdf.savefig(fig)
+            else:
+                fig.savefig(os.path.join(output_path, f"heatmaps_{kind}_{page:03d}.png"))
+            plt.close(fig)
+        if pdf is not None:
+            pdf.close()
+
+    with open(os.path.join(output_path, "atlas_index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def make_heatmap_arrs(df: pl.DataFrame, menus: List[str], normalize: bool = False) -> np.ndarray:
+    """
+    Vectorised version of make_heatmap_arr for many menus at once.
+    Counts every (menu_title, button) pair in one group by instead of filtering per menu.
+    :param df: matched selections with columns menu_title and button
+    :param menus: menu titles, defines the order of the first axis
+    :return array of shape (len(menus), BOARD_ROWS, BOARD_COLS)
+    """
+    arr = np.zeros((len(menus), BOARD_ROWS, BOARD_COLS), dtype=float)
+    # Like make_heatmap_arr, percentages include presses of buttons outside the grid
+    totals = np.zeros(len(menus), dtype=float)
+    menu_index = {m: k for k, m in enumerate(menus)}
+    counts = df.group_by("menu_title", "button").len()
+    for menu, button, n in counts.iter_rows():
+        if menu not in menu_index:
+            continue
+        totals[menu_index[menu]] += n
+        if button not in KEY_MAP:
+            continue
+        i, j = KEY_MAP[button]
+        arr[menu_index[menu], i, j] = n
+    if normalize:
+        totals = totals[:, None, None]
+        arr = np.divide(arr * 100.0, totals, out=np.zeros_like(arr), where=totals > 0)
+    return arr
+
+
+def make_phrase_grids(board: pl.DataFrame, menus: List[str]) -> List[List[List[str]]]:
+    """
+    Unformatted button phrases of every menu, i.e. make_labels without wrapping or values.
+    Buttons beyond 'R' are skipped.
+    :return nested list of shape (len(menus), BOARD_ROWS, BOARD_COLS)
+    """
+    grids = [[["" for _ in range(BOARD_COLS)] for _ in range(BOARD_ROWS)] for _ in menus]
+    menu_index = {m: k for k, m in enumerate(menus)}
+    for menu, button, phrase in board.select("menu_title", "button", "selection").iter_rows():
+        if menu not in menu_index or button not in KEY_MAP:
+            continue
+        i, j = KEY_MAP[button]
+        grids[menu_index[menu]][i][j] = phrase or ""
+    return grids
@@ -0,0 +1,209 @@
+import html
+import json
+from typing import Optional
+
+import polars as pl
+
+from constants import BOARD_ROWS, BOARD_COLS
+from heatmaps import make_heatmap_arrs, make_phrase_grids
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+  body { font-family: Helvetica, Arial, sans-serif; margin: 1.5em; }
+  .controls { margin-bottom: 1em; }
+  .controls > * { margin-right: 1em; }
+  table.grid { border-collapse: collapse; table-layout: fixed; }
+  table.grid td { width: 8em; height: 4em; border: 1px solid #ccc; text-align: center;
+                  vertical-align: middle; font-size: 0.8em; white-space: pre-wrap; }
+  table.summary td, table.summary th { padding: 0.2em 0.8em; text-align: left; }
+  .tree ul { list-style: none; padding-left: 1.2em; }
+  .tree .menu { font-weight: bold; }
+  .tree .code { color: #888; font-family: monospace; margin-right: 0.5em; }
+  section { margin-bottom: 2em; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<section>
+  <h2>Matches</h2>
+  <table class="summary" id="match-types"></table>
+</section>
+<section>
+  <h2>Heatmaps</h2>
+  <div class="controls">
+    <input id="menu-filter" type="search" placeholder="Filter menus">
+    <select id="menu-select"></select>
+    <label><input id="normalize" type="checkbox"> Percentages</label>
+    <span id="menu-total"></span>
+  </div>
+  <table class="grid" id="grid"></table>
+</section>
+<section class="tree">
+  <h2>Board</h2>
+  <div id="tree"></div>
+</section>
+<script id="payload" type="application/json">__PAYLOAD__</script>
+<script>
+const data = JSON.parse(document.getElementById("payload").textContent);
+const select = document.getElementById("menu-select");
+const filter = document.getElementById("menu-filter");
+const normalize = document.getElementById("normalize");
+
+function color(value, max) {
+  // Dark to light, similar to the seaborn "rocket" default used for the PNGs
+  const t = max > 0 ? value / max : 0;
+  return "hsl(" + (340 - 320 * t) + ", 70%, " + (10 + 75 * t) + "%)";
+}
+
+function renderGrid() {
+  const k = data.menus.indexOf(select.value);
+  const grid = document.getElementById("grid");
+  grid.innerHTML = "";
+  if (k < 0) return;
+  const counts = data.counts[k];
+  const total = data.totals[k];
+  let max = 0;
+  counts.forEach(row => row.forEach(v => { max = Math.max(max, v); }));
+  document.getElementById("menu-total").textContent = total + " presses";
+  for (let i = 0; i < data.rows; i++) {
+    const tr = grid.insertRow();
+    for (let j = 0; j < data.cols; j++) {
+      const td = tr.insertCell();
+      const v = counts[i][j];
+      const phrase = data.phrases[k][i][j];
+      td.style.background = color(v, max);
+      td.style.color = max > 0 && v / max > 0.5 ? "black" : "white";
+      if (phrase === "") continue;
+      const shown = normalize.checked ? (total > 0 ? (v / total * 100).toFixed(1) : "0.0") + "%" : v;
+      td.textContent = phrase + "\\n" + shown;
+    }
+  }
+}
+
+function renderMenus() {
+  const query = filter.value.toUpperCase();
+  const current = select.value;
+  select.innerHTML = "";
+  data.menus.filter(m => m.includes(query)).forEach(m => select.add(new Option(m, m)));
+  if (data.menus.includes(current) && current.includes(query)) select.value = current;
+  renderGrid();
+}
+
+function renderMatchTypes() {
+  const table = document.getElementById("match-types");
+  const header = table.insertRow();
+  ["match_type", "selections"].forEach(h => {
+    const th = document.createElement("th"); th.textContent = h; header.appendChild(th);
+  });
+  data.match_types.forEach(([type, n]) => {
+    const tr = table.insertRow();
+    tr.insertCell().textContent = type;
+    tr.insertCell().textContent = n;
+  });
+}
+
+function renderTree() {
+  const children = {};
+  data.tree.forEach(node => { (children[node[1]] = children[node[1]] || []).push(node); });
+  function build(parent) {
+    const ul = document.createElement("ul");
+    (children[parent] || []).forEach(([pattern, _, label, isMenu]) => {
+      const li = document.createElement("li");
+      const code = document.createElement("span");
+      code.className = "code"; code.textContent = pattern;
+      const name = document.createElement("span");
+      name.textContent = label;
+      if (isMenu && children[pattern]) {
+        const details = document.createElement("details");
+        const summary = document.createElement("summary");
+        name.className = "menu";
+        summary.append(code, name);
+        details.append(summary, build(pattern));
+        li.appendChild(details);
+      } else {
+        li.append(code, name);
+      }
+      ul.appendChild(li);
+    });
+    return ul;
+  }
+  document.getElementById("tree").appendChild(build(""));
+}
+
+filter.addEventListener("input", renderMenus);
+select.addEventListener("change", renderGrid);
+normalize.addEventListener("change", renderGrid);
+renderMatchTypes();
+renderMenus();
+renderTree();
+</script>
+</body>
+</html>
+"""
+
+
+def make_report_payload(df: pl.DataFrame, board: pl.DataFrame) -> dict:
+    """
+    Precomputes everything the report renders, so the page only draws tables.
+    :param df: full selections from combine, matched and unmatched
+    :param board: formatted board
+    :return dict with
+    rows, cols - grid shape
+    menus - sorted menu titles
+    counts - per menu BOARD_ROWS x BOARD_COLS press counts of the matched selections
+    totals - per menu number of matched presses, the denominator for percentages
+    phrases - per menu BOARD_ROWS x BOARD_COLS button phrases
+    match_types - [match_type, count] pairs, unmatched selections as NONE
+    tree - [full_pattern, menu_pattern, selection, is_menu] per board row
+    """
+    menus = board["menu_title"].unique().drop_nulls().sort().to_list()
+    matched = df.filter(pl.col("is_match"))
+    counts = make_heatmap_arrs(matched, menus)
+    totals = matched.group_by("menu_title").len()
+    totals = dict(totals.iter_rows())
+
+    match_types = df.group_by(
+        pl.col("match_type").fill_null(pl.lit("NONE"))
+    ).len().sort("len", descending=True)
+
+    tree = board.select(
+        pl.col("full_pattern"),
+        pl.col("menu_pattern").fill_null(pl.lit("")),
+        pl.col("selection").fill_null(pl.lit("")),
+        pl.col("is_menu"),
+    ).sort("full_pattern")
+
+    return {
+        "rows": BOARD_ROWS,
+        "cols": BOARD_COLS,
+        "menus": menus,
+        "counts": counts.astype(int).tolist(),
+        "totals": [totals.get(m, 0) for m in menus],
+        "phrases": make_phrase_grids(board, menus),
+        "match_types": [list(r) for r in match_types.iter_rows()],
+        "tree": [list(r) for r in tree.iter_rows()],
+    }
+
+
+def write_html_report(df: pl.DataFrame,
+                      board: pl.DataFrame,
+                      output_file: str,
+                      title: Optional[str] = None) -> None:
+    """
+    Writes a self-contained HTML report. The heatmaps are rendered by the browser from
+    the embedded JSON payload, so no images are produced.
+    :param df: full selections from combine
+    :param board: formatted board
+    """
+    payload = json.dumps(make_report_payload(df, board), separators=(",", ":"))
+    # Keep the payload from closing the script tag early
+    payload = payload.replace("</", "<\\/")
+    page = HTML_TEMPLATE.replace(
+        "__TITLE__", html.escape(title or "Board usage report")
+    ).replace("__PAYLOAD__", payload)
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(page)
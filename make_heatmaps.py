@@ -2,11 +2,18 @@
 import os
 
 import matplotlib.pyplot as plt
+import numpy as np
 import polars as pl
 import seaborn as sns
+from matplotlib.backends.backend_pdf import PdfPages
 
-from format import format_selections, format_boards, format_board_v1, combine
-from heatmaps import make_heatmap_arr, make_heatmap_plot_by_menu
+from button_stats import button_intervals, button_mask, intervals_by_menu, intervals_frame
+from board_validation import check_board
+from board_artefact import write_board_artefact
+from format import format_selections, format_boards, format_board_v1, combine_with_stats
+from heatmap_windows import make_windowed_heatmap_arrs, make_small_multiples
+from html_report import write_html_report
+from heatmaps import make_heatmap_arr, make_heatmap_arrs, make_heatmap_plot_by_menu, safe_filename, write_heatmap_atlas
 
 OUTPUT_PATH = "./figures/iteration_2/"
 BOARD_FILE = "./data/iteration_2_board.csv"
@@ -16,7 +23,14 @@ def main(board_file: str=BOARD_FILE,
          selections_file: str=SELECTIONS_FILE,
          output_path: str=OUTPUT_PATH,
          is_v1: bool=False,
-         max_board_ln: int=None,):
+         max_board_ln: int=None,
+         atlas: bool=False,
+         atlas_format: str="pdf",
+         html_report: bool=False,
+         window: str=None,
+         interval_method: str=None,
+         n_workers: int=None,
+         strict_board: bool=False,):
 
     board = pl.read_csv(board_file)
     if max_board_ln:
@@ -28,6 +42,10 @@ def main(board_file: str=BOARD_FILE,
     else:
         formatted_board = format_boards(board)
     formatted_board.write_csv(os.path.join(output_path, "formatted_board.csv"))
+    validation = check_board(formatted_board, strict=strict_board)
+    validation.write_csv(os.path.join(output_path, "board_validation.csv"))
+    # Downstream scripts open the compiled board instead of re-parsing the CSV
+    formatted_board = write_board_artefact(formatted_board, output_path)
 
     formatted_selections = format_selections(selections)
     formatted_selections.write_csv(os.path.join(output_path, "formatted_selections.csv"))
@@ -38,11 +56,18 @@ def main(board_file: str=BOARD_FILE,
     bad_matches = bad_match_base.filter(pl.col('full_pattern').is_null()).group_by("selection").len().sort("len", descending=True)
     bad_matches.write_csv(os.path.join(output_path, "missing_selections.csv"))
 
-    df, unmatched = combine(selections=formatted_selections, board=formatted_board,)
+    df, unmatched, match_stats, match_summary = combine_with_stats(selections=formatted_selections,
+                                                                   board=formatted_board,)
 
 
     df.write_csv(os.path.join(output_path, "full_selections.csv"))
     unmatched.write_csv(os.path.join(output_path, "unmatched_selections.csv"))
+    match_stats.write_csv(os.path.join(output_path, "match_stats.csv"))
+    match_summary.write_csv(os.path.join(output_path, "match_summary.csv"))
+
+    if html_report:
+        write_html_report(df, formatted_board, os.path.join(output_path, "report.html"),
+                          title=os.path.basename(os.path.normpath(output_path)))
 
     plot_df = df.filter(pl.col("is_match"))
 
@@ -65,12 +90,35 @@ def main(board_file: str=BOARD_FILE,
     plt.close(fig)
 
     menus = formatted_board["menu_title"].unique().to_list()
+    intervals = None
+    if interval_method:
+        # Uncertainty of the percentages, e.g. interval_method="dirichlet" or "bootstrap"
+        counts = make_heatmap_arrs(plot_df, sorted(menus))
+        estimate, lower, upper = button_intervals(counts, mask=button_mask(formatted_board, sorted(menus)),
+                                                  method=interval_method, n_workers=n_workers)
+        intervals_frame(sorted(menus), counts, estimate, lower, upper).write_csv(os.path.join(output_path, "button_intervals.csv"))
+        intervals = intervals_by_menu(sorted(menus), estimate, lower, upper)
+    if window:
+        # Usage over time, e.g. window="session" or window="1w"
+        windows, windowed = make_windowed_heatmap_arrs(plot_df, sorted(menus), every=window)
+        np.savez_compressed(os.path.join(output_path, f"heatmaps_{safe_filename(window)}.npz"),
+                            counts=windowed, windows=np.array([str(w) for w in windows]), menus=np.array(sorted(menus)))
+        with PdfPages(os.path.join(output_path, f"heatmaps_{safe_filename(window)}.pdf")) as pdf:
+            for k, menu in enumerate(sorted(menus)):
+                fig, axes = make_small_multiples(windowed[:, k], windows, menu)
+                pdf.savefig(fig)
+                plt.close(fig)
+    if atlas:
+        write_heatmap_atlas(plot_df, formatted_board, output_path, menus=sorted(menus), file_format=atlas_format,
+                            intervals=intervals)
+        return
     for menu in menus:
         fig, ax = make_heatmap_plot_by_menu(plot_df, menu, board=formatted_board)
-        fig.savefig(os.path.join(output_path, f"{menu}_cts.png"))
+        fig.savefig(os.path.join(output_path, f"{safe_filename(menu)}_cts.png"))
         plt.close(fig)
-        fig, ax = make_heatmap_plot_by_menu(plot_df, menu, board=formatted_board, normalize=True)
-        fig.savefig(os.path.join(output_path, f"{menu}_pct.png"))
+        fig, ax = make_heatmap_plot_by_menu(plot_df, menu, board=formatted_board, normalize=True,
+                                            intervals=intervals.get(menu) if intervals else None)
+        fig.savefig(os.path.join(output_path, f"{safe_filename(menu)}_pct.png"))
         plt.close(fig)
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+from typing import Optional, Sequence
+
+import polars as pl
+
+from board_artefact import scan_board
+
+CHANGE_ADDED = "ADDED"
+CHANGE_REMOVED = "REMOVED"
+CHANGE_MOVED = "MOVED"
+CHANGE_STATUS = "STATUS_CHANGED"
+
+WORD_CHANGE_COLS = [
+    "version",
+    "iteration",
+    "selection",
+    "change",
+    "patterns_before",
+    "patterns_after",
+    "is_menu_before",
+    "is_menu_after",
+    "is_final_before",
+    "is_final_after",
+    "presses_before",
+    "presses_after",
+]
+
+
+def _labels(files: Sequence[str], labels: Optional[Sequence[str]]) -> list[str]:
+    if labels is None:
+        return [f"iteration_{i + 1}" for i in range(len(files))]
+    if len(labels) != len(files):
+        raise ValueError("labels must have the same length as files")
+    return list(labels)
+
+
+def scan_boards(board_files: Sequence[str], labels: Optional[Sequence[str]] = None) -> pl.LazyFrame:
+    """
+    Lazily stacks N boards, in order.
+    :param board_files: board.arrow or formatted_board.csv files, or iteration directories (see load_board),
+    ordered from oldest to newest board version
+    :param labels: optional iteration names, defaults to iteration_1..iteration_N
+    :return lazy frame with columns
+    version
+    iteration
+    selection
+    full_pattern
+    is_menu
+    """
+    labels = _labels(board_files, labels)
+    frames = [
+        scan_board(path).select(
+            pl.lit(i, dtype=pl.Int32).alias("version"),
+            pl.lit(label).alias("iteration"),
+            pl.col("selection").cast(pl.String),
+            pl.col("full_pattern").cast(pl.String),
+            (pl.col("is_menu").cast(pl.String).str.to_lowercase() == "true").alias("is_menu"),
+        )
+        for i, (path, label) in enumerate(zip(board_files, labels))
+    ]
+    return pl.concat(frames, how="vertical")
+
+
+def scan_selections(selection_files: Sequence[str], labels: Optional[Sequence[str]] = None) -> pl.LazyFrame:
+    """
+    Lazily stacks N full_selections.csv files, in the same order as the boards.
+    :return lazy frame with columns
+    version
+    iteration
+    selection
+    """
+    labels = _labels(selection_files, labels)
+    frames = [
+        pl.scan_csv(path, infer_schema_length=0).select(
+            pl.lit(i, dtype=pl.Int32).alias("version"),
+            pl.lit(label).alias("iteration"),
+            pl.col("selection"),
+        )
+        for i, (path, label) in enumerate(zip(selection_files, labels))
+    ]
+    return pl.concat(frames, how="vertical")
+
+
+def _word_states(boards: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    One row per (word, version) the word is on the board, with the previous and next
+    appearance of the same word attached via window shifts rather than pairwise joins.
+    """
+    return boards.filter(
+        pl.col("selection").is_not_null() & (pl.col("selection") != "")
+    ).with_columns(
+        pl.col("selection").hash().alias("key")
+    ).group_by(
+        "key", "version"
+    ).agg(
+        pl.col("selection").first(),
+        pl.col("full_pattern").unique().sort().str.join("|").alias("patterns"),
+        pl.col("is_menu").any().alias("is_menu"),
+        (~pl.col("is_menu")).any().alias("is_final"),
+    ).sort(
+        "key", "version"
+    ).with_columns(
+        pl.col("version").shift(1).over("key").alias("prev_version"),
+        pl.col("version").shift(-1).over("key").alias("next_version"),
+        pl.col("patterns").shift(1).over("key").alias("prev_patterns"),
+        pl.col("is_menu").shift(1).over("key").alias("prev_is_menu"),
+        pl.col("is_final").shift(1).over("key").alias("prev_is_final"),
+    )
+
+
+def diff_boards(boards: pl.LazyFrame,
+                selections: Optional[pl.LazyFrame] = None,
+                n_versions: Optional[int] = None) -> pl.LazyFrame:
+    """
+    Computes word changes between consecutive board versions.
+    A word is keyed on its (hashed) selection text and compared against the previous version:
+    1. ADDED - on this version but not on the previous one
+    2. REMOVED - on the previous version but not on this one
+    3. MOVED - on both, but the set of full_pattern locations changed
+    4. STATUS_CHANGED - on both, but whether it is a menu and/or a final word changed
+    A word can be both MOVED and STATUS_CHANGED in the same version.
+    :param boards: frame from scan_boards
+    :param selections: optional frame from scan_selections, used for the press counts
+    :param n_versions: number of board versions, inferred from boards when not given
+    :return lazy frame with WORD_CHANGE_COLS
+    """
+    if n_versions is None:
+        n_versions = boards.select(pl.col("version").max()).collect().item() + 1
+    last_version = n_versions - 1
+
+    states = _word_states(boards)
+    consecutive = pl.col("prev_version") == pl.col("version") - 1
+    before = [
+        pl.col("prev_patterns").alias("patterns_before"),
+        pl.col("patterns").alias("patterns_after"),
+        pl.col("prev_is_menu").alias("is_menu_before"),
+        pl.col("is_menu").alias("is_menu_after"),
+        pl.col("prev_is_final").alias("is_final_before"),
+        pl.col("is_final").alias("is_final_after"),
+    ]
+
+    added = states.filter(
+        (pl.col("version") > 0) & ~consecutive.fill_null(False)
+    ).select(
+        "key", "version", "selection",
+        pl.lit(CHANGE_ADDED).alias("change"),
+        pl.lit(None, dtype=pl.String).alias("patterns_before"),
+        pl.col("patterns").alias("patterns_after"),
+        pl.lit(None, dtype=pl.Boolean).alias("is_menu_before"),
+        pl.col("is_menu").alias("is_menu_after"),
+        pl.lit(None, dtype=pl.Boolean).alias("is_final_before"),
+        pl.col("is_final").alias("is_final_after"),
+    )
+    removed = states.filter(
+        (pl.col("version") < last_version)
+        & (pl.col("next_version") != pl.col("version") + 1).fill_null(True)
+    ).select(
+        "key",
+        (pl.col("version") + 1).alias("version"),
+        "selection",
+        pl.lit(CHANGE_REMOVED).alias("change"),
+        pl.col("patterns").alias("patterns_before"),
+        pl.lit(None, dtype=pl.String).alias("patterns_after"),
+        pl.col("is_menu").alias("is_menu_before"),
+        pl.lit(None, dtype=pl.Boolean).alias("is_menu_after"),
+        pl.col("is_final").alias("is_final_before"),
+        pl.lit(None, dtype=pl.Boolean).alias("is_final_after"),
+    )
+    moved = states.filter(
+        consecutive & (pl.col("patterns") != pl.col("prev_patterns"))
+    ).select(
+        "key", "version", "selection", pl.lit(CHANGE_MOVED).alias("change"), *before
+    )
+    status = states.filter(
+        consecutive
+        & ((pl.col("is_menu") != pl.col("prev_is_menu")) | (pl.col("is_final") != pl.col("prev_is_final")))
+    ).select(
+        "key", "version", "selection", pl.lit(CHANGE_STATUS).alias("change"), *before
+    )
+    changes = pl.concat([added, removed, moved, status], how="vertical")
+
+    if selections is None:
+        changes = changes.with_columns(
+            pl.lit(None, dtype=pl.UInt32).alias("presses_before"),
+            pl.lit(None, dtype=pl.UInt32).alias("presses_after"),
+        )
+    else:
+        presses = selections.filter(
+            pl.col("selection").is_not_null()
+        ).group_by(
+            pl.col("selection").hash().alias("key"), "version"
+        ).len()
+        changes = changes.join(
+            presses.rename({"len": "presses_after"}), how="left", on=["key", "version"]
+        ).join(
+            presses.select("key", (pl.col("version") + 1).alias("version"), pl.col("len").alias("presses_before")),
+            how="left", on=["key", "version"]
+        ).with_columns(
+            pl.col("presses_before").fill_null(0),
+            pl.col("presses_after").fill_null(0),
+        )
+
+    iterations = boards.select("version", "iteration").unique()
+    return changes.join(
+        iterations, how="left", on="version"
+    ).select(
+        WORD_CHANGE_COLS
+    ).sort(
+        "version", "change", "selection"
+    )
+
+
+def word_summary(boards: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Number of board entries per word, iteration and menu status
+    """
+    return boards.group_by(
+        ["selection", "iteration", "is_menu"]
+    ).len().sort(["selection", "iteration", "is_menu"])
+
+
+def unique_word_counts(boards: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Number of board entries and of distinct words per iteration
+    """
+    return boards.filter(
+        pl.col("selection").is_not_null() & (pl.col("selection") != "")
+    ).group_by(
+        "iteration"
+    ).agg(
+        pl.len().alias("total_count"),
+        pl.col("selection").n_unique().alias("n_unique_words"),
+    ).sort("iteration")